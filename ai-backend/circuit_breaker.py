@@ -0,0 +1,142 @@
+"""
+Circuit breaker for the upstream Gemini call.
+
+Outcomes of the last BREAKER_WINDOW calls are kept. Errors, timeouts and calls
+slower than BREAKER_SLOW_CALL_SECONDS count as failures. Once at least
+BREAKER_MIN_CALLS outcomes are recorded and the failure rate reaches
+BREAKER_FAILURE_RATE, the breaker opens and /chat is answered by the local
+fallback responder. After BREAKER_COOLDOWN_SECONDS one probe request is let
+through (half-open): success closes the breaker, failure re-opens it.
+
+`allow()` returns a token that callers hand back with the outcome. Only the
+outcome carrying the current probe's token moves the breaker out of
+half-open; outcomes of calls admitted before it opened (or of prefetches)
+are logged and otherwise ignored while it isn't closed.
+"""
+
+import os
+import time
+from collections import deque
+from typing import Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Token for calls admitted while closed; probe tokens count up from 1.
+NO_PROBE = 0
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        window: int = 20,
+        min_calls: int = 5,
+        failure_rate: float = 0.5,
+        slow_call_seconds: float = 10.0,
+        cooldown_seconds: float = 30.0,
+    ):
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.cooldown_seconds = cooldown_seconds
+
+        self.outcomes = deque(maxlen=window)  # True = failure
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probe_started: Optional[float] = None
+        self.probe = NO_PROBE  # token of the outstanding half-open probe
+        self.probes = 0
+        self.trips = 0
+        self.last_failure: Optional[str] = None
+
+    @classmethod
+    def from_env(cls) -> "CircuitBreaker":
+        return cls(
+            window=int(os.getenv("BREAKER_WINDOW", "20")),
+            min_calls=int(os.getenv("BREAKER_MIN_CALLS", "5")),
+            failure_rate=float(os.getenv("BREAKER_FAILURE_RATE", "0.5")),
+            slow_call_seconds=float(os.getenv("BREAKER_SLOW_CALL_SECONDS", "10")),
+            cooldown_seconds=float(os.getenv("BREAKER_COOLDOWN_SECONDS", "30")),
+        )
+
+    def _would_allow(self, now: float) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and now - self.opened_at < self.cooldown_seconds:
+            return False
+        # Half-open: one probe at a time. A probe that never reported back
+        # (cancelled, queue timeout) is replaced after another cooldown.
+        return self.probe_started is None or now - self.probe_started >= self.cooldown_seconds
+
+    def accepting(self) -> bool:
+        """Whether a request could go upstream now, without claiming the probe."""
+        return self._would_allow(time.monotonic())
+
+    def allow(self) -> Optional[int]:
+        """Admit the next request upstream, claiming the half-open probe if due.
+
+        Returns None when refused, otherwise the token to pass to
+        record_success/record_failure (NO_PROBE unless this call is the probe).
+        """
+        now = time.monotonic()
+        if not self._would_allow(now):
+            return None
+        if self.state == CLOSED:
+            return NO_PROBE
+        self.state = HALF_OPEN
+        self.probe_started = now
+        self.probes += 1
+        self.probe = self.probes
+        return self.probe
+
+    def _ignored(self, probe: int, outcome: str) -> bool:
+        """While not closed, only the current probe's outcome counts."""
+        if self.state == CLOSED or (probe != NO_PROBE and probe == self.probe):
+            return False
+        print(f"🔌 Circuit breaker {self.state}: ignoring {outcome} of a non-probe call")
+        return True
+
+    def record_success(self, latency: float, probe: int = NO_PROBE):
+        if latency > self.slow_call_seconds:
+            self.record_failure(f"slow call ({latency:.1f}s)", probe)
+            return
+        if self._ignored(probe, "success"):
+            return
+        if self.state == HALF_OPEN:
+            print("✅ Circuit breaker closed — upstream recovered")
+            self.state = CLOSED
+            self.probe_started = None
+            self.probe = NO_PROBE
+            self.outcomes.clear()
+        self.outcomes.append(False)
+
+    def record_failure(self, reason: str, probe: int = NO_PROBE):
+        if self._ignored(probe, f"failure ({reason})"):
+            return
+        self.last_failure = reason
+        self.outcomes.append(True)
+        if self.state == HALF_OPEN:
+            self._open()
+            return
+        if self.state == CLOSED and len(self.outcomes) >= self.min_calls:
+            if sum(self.outcomes) / len(self.outcomes) >= self.failure_rate:
+                self._open()
+
+    def _open(self):
+        print(f"🔌 Circuit breaker open — {self.last_failure}")
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.probe_started = None
+        self.probe = NO_PROBE
+        self.trips += 1
+
+    def stats(self) -> dict:
+        calls = len(self.outcomes)
+        return {
+            "state": self.state,
+            "failure_rate": round(sum(self.outcomes) / calls, 3) if calls else 0.0,
+            "window_calls": calls,
+            "trips": self.trips,
+            "last_failure": self.last_failure,
+        }
@@ -0,0 +1,85 @@
+"""
+Local fallback responder used while the model is unavailable.
+
+Handles the common co-browsing intents — navigate, scroll and highlight —
+by keyword matching against the portfolio sections in portfolio_router.py
+and the ids present in the current page snapshot. No upstream calls.
+"""
+
+import re
+from typing import Optional
+
+from models import ChatResponse, TextResponse, ToolCall
+from portfolio_router import ALL_SECTIONS, PROJECTS, SECTION_ROUTES
+
+# Words visitors use for each section, on top of the section id itself.
+_SYNONYMS = {
+    "hero": ["home", "homepage", "top", "intro", "landing"],
+    "about": ["about", "bio", "yourself", "who is"],
+    "education": ["education", "degree", "study", "studies", "college", "university", "school"],
+    "experience": ["experience", "work history", "job", "internship", "career"],
+    "projects": ["project", "portfolio work", "built"],
+    "skills": ["skill", "tech stack", "technologies", "stack", "tools"],
+    "achievements": ["achievement", "award", "certification", "certificate", "hackathon"],
+    "services": ["service", "offer", "what can you do for"],
+    "contact": ["contact", "reach", "get in touch", "email", "message", "hire"],
+}
+
+_HIGHLIGHT = re.compile(r"\b(highlight|point out|point to|mark)\b")
+_SCROLL = re.compile(r"\b(scroll|jump|move down|move up)\b")
+_NAVIGATE = re.compile(r"\b(go to|goto|open|navigate|take me|visit|page)\b")
+
+LIMITED_MODE_MESSAGE = (
+    "I'm running in a limited mode right now, so I can only help you move around the site. "
+    "Try \"go to projects\", \"scroll to contact\" or \"highlight skills\"."
+)
+
+
+def _on_page(section: str, page_content: str) -> bool:
+    # Matches both the HTML snapshot (id="projects") and outline-v1 (#projects),
+    # but not longer ids such as #contact-name.
+    return re.search(rf'(id="{section}"|#{section}(?![\w-]))', page_content) is not None
+
+
+class FallbackResponder:
+    def __init__(self):
+        self.served = 0
+        self.keywords = []
+        for section in ALL_SECTIONS:
+            for word in [section, *_SYNONYMS.get(section, [])]:
+                self.keywords.append((word, section))
+        # Project titles/ids resolve to the projects section.
+        for project in PROJECTS:
+            self.keywords.append((project["title"].lower(), "projects"))
+            self.keywords.append((project["id"].replace("-", " "), "projects"))
+        # Longest phrases first so "work history" beats "work".
+        self.keywords.sort(key=lambda kw: len(kw[0]), reverse=True)
+
+    def _section(self, text: str) -> Optional[str]:
+        for word, section in self.keywords:
+            if re.search(rf"\b{re.escape(word)}", text):
+                return section
+        return None
+
+    def respond(self, message: str, page_content: str) -> ChatResponse:
+        self.served += 1
+        text = message.lower()
+        section = self._section(text)
+        if section is None:
+            return ChatResponse(response=TextResponse(content=LIMITED_MODE_MESSAGE))
+
+        on_page = _on_page(section, page_content)
+        selector = f"#{section}"
+
+        if _HIGHLIGHT.search(text):
+            if on_page:
+                return ChatResponse(response=ToolCall(action="highlight", target=selector))
+            return ChatResponse(response=ToolCall(action="navigate", target=SECTION_ROUTES[section]))
+
+        if _SCROLL.search(text) and on_page:
+            return ChatResponse(response=ToolCall(action="scroll", target=selector))
+
+        if _NAVIGATE.search(text) or not on_page:
+            return ChatResponse(response=ToolCall(action="navigate", target=SECTION_ROUTES[section]))
+
+        return ChatResponse(response=ToolCall(action="scroll", target=selector))
@@ -2,7 +2,13 @@ import google.generativeai as genai
 import json
 import os
 import re
+import time
 from models import ChatResponse, TextResponse, ToolCall
+from page_format import normalize_page_content
+
+
+class UpstreamError(Exception):
+    """The Gemini call itself failed (network, quota, server error)."""
 
 
 class GeminiAgent:
@@ -30,7 +36,16 @@ class GeminiAgent:
     def _get_system_prompt(self) -> str:
         return """You are an AI co-browsing assistant embedded inside a developer portfolio website.
 
-You will receive the "Current Page Content" as simplified HTML with key elements and attributes.
+You will receive the "Current Page Content" as a compact outline of the page:
+one element per line, indented two spaces per nesting level, written as
+  tag#id[attr=value ...]: visible text
+Values with spaces or special characters are double-quoted: input[aria-label="Email address"].
+Lines like `$1=value` at the top define aliases; an unquoted `$1` inside [...] stands for that
+value (the rest of the `$1=` line, unquoted).
+Build selectors from it: `section#projects` → "#projects", `button[type=submit]` → "button[type='submit']",
+`input[placeholder="Your Name"]` → "input[placeholder='Your Name']".
+If the content starts with `<` instead of `outline-v1`, it is the raw HTML snapshot;
+build selectors from its tags and attributes the same way.
 
 ════════════════════════════════════════════════════════════════
 RESPONSE FORMAT — ALWAYS output valid JSON. NO plain text ever.
@@ -89,7 +104,12 @@ Output the complete plan in one shot.
 
     # ── Main entry point ────────────────────────────────────────────────────────
 
-    async def process_message(self, message: str, page_content: str, history: list) -> ChatResponse:
+    async def process_message(self, message: str, page_content: str, history: list,
+                              page_format: str = "html", trace: dict = None) -> ChatResponse:
+        # `trace`, when given, is filled with the prompt, raw output and
+        # per-stage timings for tracing.TraceRecorder.
+        t0 = time.perf_counter()
+        page_content = normalize_page_content(page_content, page_format)
         context_prompt = f"Current Page Content:\n{page_content[:20000]}\n\n"
 
         history_text = ""
@@ -105,10 +125,20 @@ Output the complete plan in one shot.
             f"User: {message}\n"
             f"AI (JSON only):"
         )
+        t_prompt = time.perf_counter()
+        if trace is not None:
+            trace["prompt"] = full_prompt
+            trace["timings"] = {"prompt_ms": round((t_prompt - t0) * 1000, 2)}
 
         print(f"🚀 Single Gemini call — model: {self.model_name}")
         try:
-            response = await self.model.generate_content_async(full_prompt)
+            try:
+                response = await self.model.generate_content_async(full_prompt)
+            except Exception as e:
+                raise UpstreamError(str(e)) from e
+            t_model = time.perf_counter()
+            if trace is not None:
+                trace["timings"]["model_ms"] = round((t_model - t_prompt) * 1000, 2)
 
             if response.prompt_feedback and response.prompt_feedback.block_reason:
                 return ChatResponse(response=TextResponse(
@@ -131,6 +161,8 @@ Output the complete plan in one shot.
                     pass
 
             print(f"📥 Raw response ({len(raw_text)} chars): {raw_text[:300]}")
+            if trace is not None:
+                trace["raw_output"] = raw_text
 
             # Extract and parse JSON
             json_str = self._extract_json(raw_text)
@@ -177,6 +209,9 @@ Output the complete plan in one shot.
             return ChatResponse(response=TextResponse(
                 content=raw_text.strip() or "I couldn't format my response. Please try again."
             ))
+        except UpstreamError:
+            # Let the caller's circuit breaker see it and fall back.
+            raise
         except Exception as e:
             print(f"❌ Gemini Error: {e}")
             import traceback
@@ -0,0 +1,137 @@
+"""
+Request-size limits for /chat.
+
+Two layers, both cheaper than full validation:
+  • BodySizeLimitMiddleware rejects bodies over MAX_BODY_BYTES with 413 —
+    from Content-Length when present, otherwise while streaming the body in.
+  • ChatRequest's "before" validator (models.py) calls `enforce_field_limits`
+    on the raw decoded JSON: oversized `message` / `page_content` are
+    rejected with 413, and `history` is cut to its last MAX_HISTORY_ITEMS
+    before any HistoryItem is built.
+Rejection and truncation counts are reported on /health.
+"""
+
+import json
+import os
+from collections import Counter
+
+MAX_BODY_BYTES = int(os.getenv("MAX_BODY_BYTES", str(512 * 1024)))
+MAX_MESSAGE_CHARS = int(os.getenv("MAX_MESSAGE_CHARS", "4000"))
+MAX_PAGE_CONTENT_CHARS = int(os.getenv("MAX_PAGE_CONTENT_CHARS", "50000"))
+MAX_HISTORY_ITEMS = int(os.getenv("MAX_HISTORY_ITEMS", "10"))
+MAX_HISTORY_PART_CHARS = int(os.getenv("MAX_HISTORY_PART_CHARS", "4000"))
+
+metrics = Counter()
+
+
+class PayloadTooLarge(Exception):
+    def __init__(self, field: str, size: int, limit: int):
+        super().__init__(f"{field} is {size} (limit {limit})")
+        self.field = field
+        self.size = size
+        self.limit = limit
+
+
+def enforce_field_limits(data):
+    """Check per-field limits on a raw request dict, truncating history in place."""
+    if not isinstance(data, dict):
+        return data
+
+    for field, limit in (("message", MAX_MESSAGE_CHARS), ("page_content", MAX_PAGE_CONTENT_CHARS)):
+        value = data.get(field)
+        if isinstance(value, str) and len(value) > limit:
+            metrics[f"rejected_{field}"] += 1
+            raise PayloadTooLarge(field, len(value), limit)
+
+    history = data.get("history")
+    if isinstance(history, list):
+        if len(history) > MAX_HISTORY_ITEMS:
+            metrics["history_truncated"] += 1
+            history = history[-MAX_HISTORY_ITEMS:] if MAX_HISTORY_ITEMS > 0 else []
+        for item in history:
+            parts = item.get("parts") if isinstance(item, dict) else None
+            if isinstance(parts, list):
+                item["parts"] = [
+                    p[:MAX_HISTORY_PART_CHARS] if isinstance(p, str) else p for p in parts
+                ]
+        data["history"] = history
+
+    return data
+
+
+class BodySizeLimitMiddleware:
+    """Pure ASGI middleware: 413 for request bodies larger than `max_bytes`."""
+
+    def __init__(self, app, max_bytes: int = MAX_BODY_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in ("GET", "HEAD", "OPTIONS"):
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope.get("headers", []):
+            if name == b"content-length":
+                try:
+                    declared = int(value)
+                except ValueError:
+                    break
+                if declared > self.max_bytes:
+                    metrics["rejected_body"] += 1
+                    await self._reject(send, declared)
+                    return
+                break
+
+        # No (or an honest-looking) Content-Length: read the body ourselves and
+        # stop as soon as it crosses the limit, then replay it to the app.
+        chunks = []
+        received = 0
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunk = message.get("body", b"")
+            received += len(chunk)
+            if received > self.max_bytes:
+                metrics["rejected_body"] += 1
+                await self._reject(send, received)
+                return
+            chunks.append(chunk)
+            more_body = message.get("more_body", False)
+
+        body = b"".join(chunks)
+        replayed = False
+
+        async def replay():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        await self.app(scope, replay, send)
+
+    async def _reject(self, send, size: int):
+        print(f"🚫 Request body too large: {size} bytes (limit {self.max_bytes})")
+        payload = json.dumps({"detail": f"Request body exceeds {self.max_bytes} bytes"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(payload)).encode()),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": payload})
+
+
+def stats() -> dict:
+    return {
+        "max_body_bytes": MAX_BODY_BYTES,
+        "max_page_content_chars": MAX_PAGE_CONTENT_CHARS,
+        "max_history_items": MAX_HISTORY_ITEMS,
+        **metrics,
+    }
@@ -1,10 +1,20 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from gemini_agent import GeminiAgent
+from gemini_agent import GeminiAgent, UpstreamError
 from models import ChatRequest, ChatResponse
 from portfolio_router import router as portfolio_router
+from prefetch import Prefetcher
+import limits
+from quotas import quota_from_env, retry_after_header
+from scheduler import FairScheduler, QueueTimeout
+from tracing import TraceRecorder
+from circuit_breaker import CLOSED, NO_PROBE, CircuitBreaker
+from fallback import FallbackResponder
+import asyncio
 import os
+import time
 from dotenv import load_dotenv
 
 from pathlib import Path
@@ -19,6 +29,15 @@ app = FastAPI()
 
 app.include_router(portfolio_router)
 
+# Reject oversized bodies before they are parsed. Added before CORS so that
+# CORSMiddleware wraps it and 413 responses still carry CORS headers.
+app.add_middleware(limits.BodySizeLimitMiddleware, max_bytes=limits.MAX_BODY_BYTES)
+
+@app.exception_handler(limits.PayloadTooLarge)
+async def payload_too_large(request, exc: limits.PayloadTooLarge):
+    print(f"🚫 Rejected request: {exc}")
+    return JSONResponse(status_code=413, content={"detail": str(exc)})
+
 # CORS configuration
 # Be very permissive for production deployment to avoid headers issues
 raw_origins = os.getenv("ALLOWED_ORIGINS", "*").split(",")
@@ -52,34 +71,126 @@ else:
         print(f"❌ Failed to initialize GeminiAgent: {e}")
         agent = None
 
+# Per-client quotas and fair sharing of upstream slots between visitors
+quota = quota_from_env()
+scheduler = FairScheduler.from_env()
+trusted_proxy_hops = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+
+# Degraded mode: per-request deadline, breaker, and a local responder for
+# navigation intents while the model is slow or down.
+upstream_timeout = float(os.getenv("UPSTREAM_TIMEOUT_SECONDS", "20"))
+breaker = CircuitBreaker.from_env()
+fallback = FallbackResponder()
+
+prefetcher = Prefetcher.from_env(agent, scheduler, breaker, upstream_timeout) if agent else None
+recorder = TraceRecorder.from_env()
+
+def respond_locally(request: ChatRequest, reason: str) -> ChatResponse:
+    print(f"🛟 Fallback responder ({reason}): {request.message[:100]}")
+    return fallback.respond(request.message, request.page_content)
+
+def client_key(raw_request: Request) -> str:
+    # client.host is the TCP peer, or the visitor's IP when uvicorn rewrote it
+    # for a proxy listed in FORWARDED_ALLOW_IPS. With TRUSTED_PROXY_HOPS=n the
+    # n-th X-Forwarded-For entry from the right is used instead: each of our
+    # proxies appends the address it saw, so anything further left was sent
+    # by the client and can be forged.
+    host = raw_request.client.host if raw_request.client else "unknown"
+    if trusted_proxy_hops <= 0:
+        return host
+    forwarded = [p.strip() for p in raw_request.headers.get("x-forwarded-for", "").split(",")]
+    forwarded = [p for p in forwarded if p]
+    if len(forwarded) < trusted_proxy_hops:
+        return host
+    return forwarded[-trusted_proxy_hops]
+
 @app.api_route("/health", methods=["GET", "POST", "HEAD"])
 async def health():
     return {
         "status": "ok", 
         "model": model_env,
         "agent_online": agent is not None,
-        "allowed_origins": origins
+        "mode": "normal" if agent is not None and breaker.state == CLOSED else "fallback",
+        "breaker": breaker.stats(),
+        "fallback_served": fallback.served,
+        "allowed_origins": origins,
+        "prefetch": prefetcher.stats() if prefetcher else None,
+        "limits": limits.stats(),
+        "scheduler": scheduler.stats(),
+        "traces_recorded": recorder.recorded if recorder else None,
     }
 
 @app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
-    if not agent:
-        raise HTTPException(status_code=503, detail="AI Agent is not initialized. Check GOOGLE_API_KEY.")
+async def chat(request: ChatRequest, raw_request: Request, background_tasks: BackgroundTasks):
+    client = client_key(raw_request)
+    # "batch" for replays/scripts; anything else is treated as an interactive visitor.
+    lane = "batch" if raw_request.headers.get("x-traffic-class") == "batch" else "interactive"
+    if quota:
+        wait = await quota.take(client)
+        if wait > 0:
+            print(f"🚦 Quota exceeded for {client} (retry in {wait:.1f}s)")
+            raise HTTPException(status_code=429, detail="Too many requests. Please slow down.",
+                                headers=retry_after_header(wait))
     
     try:
         # Log the page content for debugging
         print(f"\n{'='*80}")
         print(f"📨 Received message: {request.message}")
-        print(f"📄 Page content length: {len(request.page_content)} chars")
+        print(f"📄 Page content length: {len(request.page_content)} chars ({request.page_format})")
         print(f"📄 Page content preview (first 500 chars):")
         print(request.page_content[:500])
         print(f"{'='*80}\n")
-        
-        response = await agent.process_message(
-            message=request.message,
-            page_content=request.page_content,
-            history=request.history
-        )
+
+        if prefetcher:
+            prefetcher.observe(request.route, request.message)
+            # Warm the likely next messages for this page while the user reads.
+            if breaker.state == CLOSED:
+                background_tasks.add_task(
+                    prefetcher.prefetch, request.route, request.page_content,
+                    request.page_format, request.message, request.history
+                )
+            cached = prefetcher.lookup(request.route, request.message, request.page_content,
+                                       request.history)
+            if cached:
+                print(f"⚡ Prefetch hit for {request.route}")
+                return cached
+
+        if not agent:
+            return respond_locally(request, "agent not initialized")
+        if not breaker.accepting():
+            return respond_locally(request, "circuit open")
+
+        trace = recorder.start(request) if recorder else None
+        started = time.perf_counter()
+        probe = NO_PROBE
+        try:
+            async with scheduler.slot(client, lane):
+                # The breaker may have opened while this request was queued.
+                probe = breaker.allow()
+                if probe is None:
+                    return respond_locally(request, "circuit open")
+                upstream_started = time.perf_counter()
+                response = await asyncio.wait_for(
+                    agent.process_message(
+                        message=request.message,
+                        page_content=request.page_content,
+                        history=request.history,
+                        page_format=request.page_format,
+                        trace=trace
+                    ),
+                    timeout=upstream_timeout,
+                )
+                breaker.record_success(time.perf_counter() - upstream_started, probe)
+        except asyncio.TimeoutError:
+            breaker.record_failure(f"timeout after {upstream_timeout}s", probe)
+            return respond_locally(request, "upstream timeout")
+        except UpstreamError as e:
+            breaker.record_failure(f"upstream error: {e}", probe)
+            return respond_locally(request, "upstream error")
+        if trace is not None:
+            trace.setdefault("timings", {})["total_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            trace["output"] = response.model_dump()
+            background_tasks.add_task(recorder.write, trace)
         
         # Log the response (using response.response because of the Pydantic model structure)
         print(f"\n{'='*80}")
@@ -93,6 +204,9 @@ async def chat(request: ChatRequest):
         print(f"{'='*80}\n")
         
         return response
+    except QueueTimeout as e:
+        print(f"⏳ {client}: {e}")
+        return respond_locally(request, "no upstream slot")
     except Exception as e:
         print(f"❌ Error in chat endpoint: {e}")
         import traceback
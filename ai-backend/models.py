@@ -1,5 +1,6 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from typing import List, Optional, Literal, Union, Dict, Any
+from limits import enforce_field_limits
 
 class Message(BaseModel):
     role: Literal["user", "model"]
@@ -12,8 +13,19 @@ class HistoryItem(BaseModel):
 class ChatRequest(BaseModel):
     message: str
     page_content: str
+    # "html" = legacy domExtractor snapshot (converted server-side),
+    # "outline-v1" = compact outline from page_format.py, passed through as-is.
+    page_format: Literal["html", "outline-v1"] = "html"
+    # Current pathname (e.g. "/projects"); enables per-route prefetching.
+    route: Optional[str] = None
     history: List[HistoryItem] = []
 
+    @model_validator(mode="before")
+    @classmethod
+    def _apply_limits(cls, data):
+        # Runs on the raw JSON, so oversized history is dropped before validation.
+        return enforce_field_limits(data)
+
 class ToolCall(BaseModel):
     type: Literal["action"] = "action"
     action: Literal["scroll", "navigate", "click", "highlight", "input", "focus"]
@@ -0,0 +1,200 @@
+"""
+Compact page outline format.
+
+The frontend snapshot (src/services/domExtractor.ts) is pseudo-HTML with an
+open and close tag for every kept element. The model only needs structure,
+selectors and visible text, so we re-encode it as an indented outline:
+
+    outline-v1
+    $1=https://github.com/SwayamSat
+    section#projects
+      h2: Featured Projects
+      a[href=$1]: GitHub
+      input#contact-name[placeholder="Your Name"]
+
+One line per element, two spaces of indent per level, `#id` for ids,
+`[k=v ...]` for the remaining attributes and `: text` for inline text.
+Values containing whitespace, quotes, `]` or a leading `$` are written in
+double quotes (`aria-label="Email address"`). Attribute values that repeat
+are interned once in the `$n=value` header.
+
+Snapshots from older widgets don't escape page text, so a stray `<` can be
+read as a tag (`a<b stuff<a href=...>` becomes a `b` element). Tags the
+extractor never emits and unexpected attributes raise MalformedSnapshot,
+and `normalize_page_content` sends the raw snapshot instead.
+"""
+
+import re
+from collections import Counter
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, Tuple
+
+OUTLINE_V1 = "outline-v1"
+PAGE_FORMATS = ("html", OUTLINE_V1)
+
+# Only values at least this long are worth replacing with a `$n` alias.
+_INTERN_MIN_LEN = 8
+_VOID_TAGS = {"input", "br", "hr", "img", "meta", "link"}
+_WS = re.compile(r"\s+")
+_NEEDS_QUOTES = re.compile(r'[\s\]"]|^\$|^$')
+# Tags and attributes domExtractor.ts can emit; anything else came from page text.
+_EXTRACTED_TAGS = {
+    "section", "main", "header", "footer", "nav", "article", "form",
+    "h1", "h2", "h3", "h4", "h5", "h6",
+    "a", "button", "input", "textarea", "select",
+    "div", "span", "p", "li", "ul", "ol", "label",
+}
+_EXTRACTED_ATTRS = {"id", "name", "placeholder", "aria-label", "type", "href"}
+
+
+class MalformedSnapshot(ValueError):
+    """The snapshot contains markup the extractor could not have produced."""
+
+
+def _quote(value: str) -> str:
+    if not _NEEDS_QUOTES.search(value):
+        return value
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+class _Node:
+    __slots__ = ("tag", "attrs", "text", "children")
+
+    def __init__(self, tag: str, attrs: List[Tuple[str, str]]):
+        self.tag = tag
+        self.attrs = attrs
+        self.text: List[str] = []
+        self.children: List["_Node"] = []
+
+
+def _clean_attrs(attrs) -> List[Tuple[str, str]]:
+    # Newlines inside a value would break the one-element-per-line layout.
+    return [(k, _WS.sub(" ", v or "").strip()) for k, v in attrs]
+
+
+class _SnapshotParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = _Node("", [])
+        self.stack = [self.root]
+
+    @staticmethod
+    def _check(tag, attrs):
+        if tag not in _EXTRACTED_TAGS:
+            raise MalformedSnapshot(f"unexpected tag <{tag}>")
+        for k, _ in attrs:
+            if k not in _EXTRACTED_ATTRS:
+                raise MalformedSnapshot(f"unexpected attribute {k!r} on <{tag}>")
+
+    def handle_starttag(self, tag, attrs):
+        self._check(tag, attrs)
+        node = _Node(tag, _clean_attrs(attrs))
+        self.stack[-1].children.append(node)
+        if tag not in _VOID_TAGS:
+            self.stack.append(node)
+
+    def handle_startendtag(self, tag, attrs):
+        self._check(tag, attrs)
+        self.stack[-1].children.append(_Node(tag, _clean_attrs(attrs)))
+
+    def handle_endtag(self, tag):
+        # Snapshots are cut at a fixed length, so tags may be unbalanced —
+        # close back to the nearest matching open tag and ignore strays.
+        for i in range(len(self.stack) - 1, 0, -1):
+            if self.stack[i].tag == tag:
+                del self.stack[i:]
+                return
+
+    def handle_data(self, data):
+        text = _WS.sub(" ", data).strip()
+        if text:
+            self.stack[-1].text.append(text)
+
+
+def _walk(node: _Node, depth: int = 0):
+    for child in node.children:
+        yield child, depth
+        yield from _walk(child, depth + 1)
+
+
+def html_to_outline(html: str) -> str:
+    """Convert a domExtractor HTML snapshot into the outline-v1 format.
+
+    Raises MalformedSnapshot when unescaped page text was parsed as markup.
+    """
+    parser = _SnapshotParser()
+    parser.feed(html)
+    parser.close()
+
+    nodes = list(_walk(parser.root))
+    counts = Counter(
+        v for node, _ in nodes for k, v in node.attrs
+        if k != "id" and len(v) >= _INTERN_MIN_LEN
+    )
+    aliases: Dict[str, str] = {}
+    for value, n in counts.most_common():
+        if n < 2:
+            break
+        aliases[value] = f"${len(aliases) + 1}"
+
+    lines = [OUTLINE_V1]
+    lines.extend(f"{alias}={value}" for value, alias in aliases.items())
+
+    for node, depth in nodes:
+        line = "  " * depth + node.tag
+        others = []
+        for k, v in node.attrs:
+            if k == "id" and v:
+                line += f"#{v}"
+            else:
+                others.append(f"{k}={aliases[v] if v in aliases else _quote(v)}")
+        if others:
+            line += f"[{' '.join(others)}]"
+        if node.text:
+            line += f": {' '.join(node.text)}"
+        lines.append(line)
+
+    # Text sitting directly under <body> (outside any kept element).
+    if parser.root.text:
+        lines.append(": " + " ".join(parser.root.text))
+
+    return "\n".join(lines)
+
+
+def normalize_page_content(page_content: str, page_format: str = "html") -> str:
+    """Return page content in outline form, converting legacy HTML snapshots."""
+    if page_format == OUTLINE_V1 or not page_content.strip():
+        return page_content
+    try:
+        return html_to_outline(page_content)
+    except Exception as e:
+        print(f"⚠️ Outline conversion failed, sending raw HTML: {e}")
+        return page_content
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 chars/token, the usual Gemini rule of thumb)."""
+    return (len(text) + 3) // 4
+
+
+def measure(html: str) -> Dict[str, float]:
+    """Size comparison between an HTML snapshot and its outline."""
+    outline = html_to_outline(html)
+    html_tokens, outline_tokens = estimate_tokens(html), estimate_tokens(outline)
+    return {
+        "html_chars": len(html),
+        "outline_chars": len(outline),
+        "html_tokens": html_tokens,
+        "outline_tokens": outline_tokens,
+        "token_savings": round(1 - outline_tokens / html_tokens, 3) if html_tokens else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    # Usage: python page_format.py snapshot1.html [snapshot2.html ...]
+    # Capture snapshots from the browser console with getVisiblePageContent().
+    import sys
+
+    for path in sys.argv[1:]:
+        with open(path, encoding="utf-8") as f:
+            print(path, measure(f.read()))
@@ -285,6 +285,22 @@ CONTACT = {
     "response_time": "Typically responds within 24 hours.",
 }
 
+# Section id → data. Ids match the frontend routes and section element ids.
+ALL_SECTIONS = {
+    "hero": HERO,
+    "about": ABOUT,
+    "education": EDUCATION,
+    "experience": EXPERIENCE,
+    "projects": PROJECTS,
+    "skills": SKILLS,
+    "achievements": ACHIEVEMENTS,
+    "services": SERVICES,
+    "contact": CONTACT,
+}
+
+# Section id → frontend route.
+SECTION_ROUTES = {section: "/" if section == "hero" else f"/{section}" for section in ALL_SECTIONS}
+
 # ───────────────────────────── routes ─────────────────────────────
 
 @router.get("/hero")
@@ -344,14 +360,4 @@ async def get_contact():
 @router.get("/all")
 async def get_all():
     """All portfolio sections in a single response — useful for AI agents."""
-    return {
-        "hero": HERO,
-        "about": ABOUT,
-        "education": EDUCATION,
-        "experience": EXPERIENCE,
-        "projects": PROJECTS,
-        "skills": SKILLS,
-        "achievements": ACHIEVEMENTS,
-        "services": SERVICES,
-        "contact": CONTACT,
-    }
+    return ALL_SECTIONS
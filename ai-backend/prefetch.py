@@ -0,0 +1,274 @@
+"""
+Speculative prefetch of likely next messages per route.
+
+Visitors follow predictable paths (on /projects they ask about a project, on
+/contact they ask to fill the form). We count which messages follow each
+route and, after answering a request, precompute the top-N most frequent
+next messages against the same page snapshot while the user is reading.
+Upstream calls are capped by a per-minute budget; hits/misses are counted so
+the hit rate can be checked on /health.
+
+Prefetched answers are generated with the visitor's history plus the message
+just answered, and cached under a digest of the user turns in it. The
+visitor's next request carries the same user turns, so it finds the entry;
+model turns (the widget's greeting, action confirmations) are left out of the
+digest because the widget writes them itself. Only known portfolio routes are
+tracked, and each route keeps at most PREFETCH_MAX_MESSAGES distinct messages.
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import time
+from collections import Counter, OrderedDict, defaultdict, deque
+from typing import Dict, Optional, Tuple
+
+from circuit_breaker import CLOSED
+from gemini_agent import UpstreamError
+from models import ChatResponse, HistoryItem, TextResponse
+from portfolio_router import SECTION_ROUTES
+
+_WS = re.compile(r"\s+")
+_KNOWN_ROUTES = frozenset(SECTION_ROUTES.values())
+# Long free-form messages practically never repeat; don't spend memory on them.
+_MAX_TRACKED_MESSAGE_CHARS = 300
+# User turns that identify a conversation in the cache key.
+_CONVERSATION_TURNS = 3
+
+# Replies gemini_agent returns when the upstream call failed — never cache these.
+_ERROR_PREFIXES = (
+    "I encountered an error",
+    "I'm having trouble generating",
+    "I cannot answer that due to safety",
+    "I couldn't format my response",
+)
+
+
+def normalize_message(message: str) -> str:
+    return _WS.sub(" ", message.strip().lower()).rstrip("?!. ")
+
+
+def normalize_route(route: Optional[str]) -> Optional[str]:
+    """Known portfolio path for `route`, or None for anything else."""
+    if not route:
+        return None
+    route = route.split("?", 1)[0].split("#", 1)[0].rstrip("/") or "/"
+    return route if route in _KNOWN_ROUTES else None
+
+
+def _page_key(page_content: str) -> str:
+    return hashlib.blake2b(page_content.encode("utf-8"), digest_size=12).hexdigest()
+
+
+def _conversation_key(history: list) -> str:
+    """Digest of the user turns in `history`; "" when there are none."""
+    turns = [normalize_message(" ".join(item.parts)) for item in history if item.role == "user"]
+    # Only the most recent turns: older ones fall off as the request limits
+    # trim history, and the next request must still produce the same digest.
+    turns = turns[-_CONVERSATION_TURNS:]
+    if not turns:
+        return ""
+    return hashlib.blake2b("\n".join(turns).encode("utf-8"), digest_size=12).hexdigest()
+
+
+class Prefetcher:
+    def __init__(
+        self,
+        agent,
+        top_n: int = 2,
+        min_count: int = 2,
+        budget_per_minute: int = 6,
+        max_entries: int = 256,
+        ttl_seconds: float = 600.0,
+        max_messages: int = 100,
+        scheduler=None,
+        breaker=None,
+        upstream_timeout: float = 20.0,
+    ):
+        self.agent = agent
+        self.scheduler = scheduler
+        self.breaker = breaker
+        self.upstream_timeout = upstream_timeout
+        self.top_n = top_n
+        self.min_count = min_count
+        self.budget_per_minute = budget_per_minute
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_messages = max_messages
+
+        # route -> Counter(normalized message -> times asked on that route)
+        self.transitions: Dict[str, Counter] = defaultdict(Counter)
+        # route -> normalized message -> original wording (sent when prefetching)
+        self.originals: Dict[str, Dict[str, str]] = defaultdict(dict)
+        # (route, page digest, conversation digest, message) -> (stored at, response)
+        self.cache: "OrderedDict[Tuple[str, str, str, str], Tuple[float, ChatResponse]]" = OrderedDict()
+        self.inflight: set = set()
+        self.calls = deque()  # timestamps of upstream prefetch calls in the last minute
+
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0
+        self.budget_skipped = 0
+
+    @classmethod
+    def from_env(cls, agent, scheduler=None, breaker=None,
+                 upstream_timeout: float = 20.0) -> Optional["Prefetcher"]:
+        top_n = int(os.getenv("PREFETCH_TOP_N", "2"))
+        if top_n <= 0:
+            return None
+        return cls(
+            agent,
+            top_n=top_n,
+            min_count=int(os.getenv("PREFETCH_MIN_COUNT", "2")),
+            budget_per_minute=int(os.getenv("PREFETCH_BUDGET_PER_MIN", "6")),
+            max_entries=int(os.getenv("PREFETCH_MAX_ENTRIES", "256")),
+            ttl_seconds=float(os.getenv("PREFETCH_TTL_SECONDS", "600")),
+            max_messages=int(os.getenv("PREFETCH_MAX_MESSAGES", "100")),
+            scheduler=scheduler,
+            breaker=breaker,
+            upstream_timeout=upstream_timeout,
+        )
+
+    # ── Lookup / observation ────────────────────────────────────────────────────
+
+    def lookup(self, route: Optional[str], message: str, page_content: str,
+               history: list) -> Optional[ChatResponse]:
+        """Return a prefetched response for this page, conversation and message, if any."""
+        route = normalize_route(route)
+        if not route:
+            # Untracked route: can never hit, but still counts against the hit rate.
+            self.misses += 1
+            return None
+        key = (route, _page_key(page_content), _conversation_key(history), normalize_message(message))
+        entry = self.cache.get(key)
+        if entry and time.monotonic() - entry[0] < self.ttl_seconds:
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        if entry:
+            del self.cache[key]
+        self.misses += 1
+        return None
+
+    def observe(self, route: Optional[str], message: str):
+        """Record that `message` was asked while the visitor was on `route`."""
+        route = normalize_route(route)
+        norm = normalize_message(message)
+        if not route or not norm or len(norm) > _MAX_TRACKED_MESSAGE_CHARS:
+            return
+        counts = self.transitions[route]
+        counts[norm] += 1
+        self.originals[route][norm] = message.strip()
+        if len(counts) > self.max_messages:
+            # Keep the more frequent half; the long tail is never prefetched anyway.
+            for stale, _ in counts.most_common()[self.max_messages // 2:]:
+                del counts[stale]
+                del self.originals[route][stale]
+
+    # ── Background prefetch ─────────────────────────────────────────────────────
+
+    def _take_budget(self) -> bool:
+        now = time.monotonic()
+        while self.calls and now - self.calls[0] > 60:
+            self.calls.popleft()
+        if len(self.calls) >= self.budget_per_minute:
+            return False
+        self.calls.append(now)
+        return True
+
+    def _store(self, key, response: ChatResponse):
+        self.cache[key] = (time.monotonic(), response)
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False)
+
+    async def prefetch(self, route: Optional[str], page_content: str,
+                       page_format: str = "html", answered: str = "",
+                       history: Optional[list] = None):
+        """Precompute answers for the most likely next messages on this page.
+
+        `answered` is the message just handled live and `history` the history
+        it was sent with; together they are the user turns of the visitor's
+        next request. `answered` itself is not prefetched again.
+        """
+        route = normalize_route(route)
+        if not route or route not in self.transitions:
+            return
+        history = list(history or [])
+        if answered:
+            history.append(HistoryItem(role="user", parts=[answered]))
+        page = _page_key(page_content)
+        conversation = _conversation_key(history)
+        skip = normalize_message(answered)
+        for norm, count in self.transitions[route].most_common(self.top_n + 1):
+            if count < self.min_count:
+                break
+            if norm == skip:
+                continue
+            key = (route, page, conversation, norm)
+            if key in self.cache or key in self.inflight:
+                continue
+            if not self._take_budget():
+                self.budget_skipped += 1
+                return
+            self.inflight.add(key)
+            try:
+                response = await self._call(self.originals[route][norm], page_content,
+                                            page_format, history)
+                if response is None:
+                    return
+                self.prefetched += 1
+                if not (isinstance(response.response, TextResponse)
+                        and response.response.content.startswith(_ERROR_PREFIXES)):
+                    self._store(key, response)
+            except Exception as e:
+                print(f"⚠️ Prefetch failed for {route} / {norm!r}: {e}")
+            finally:
+                self.inflight.discard(key)
+
+    async def _call(self, message: str, page_content: str, page_format: str,
+                    history: list) -> Optional[ChatResponse]:
+        if self.scheduler is None:
+            return await self._call_upstream(message, page_content, page_format, history)
+        # Speculative work rides the low-priority lane so it never delays visitors.
+        async with self.scheduler.slot("prefetch", "batch"):
+            return await self._call_upstream(message, page_content, page_format, history)
+
+    async def _call_upstream(self, message: str, page_content: str, page_format: str,
+                             history: list) -> Optional[ChatResponse]:
+        """Same deadline and breaker accounting as /chat; None when the breaker isn't closed."""
+        # Never spend a half-open probe on speculative work.
+        if self.breaker is not None and self.breaker.state != CLOSED:
+            return None
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(
+                self.agent.process_message(
+                    message=message, page_content=page_content, history=history, page_format=page_format
+                ),
+                timeout=self.upstream_timeout,
+            )
+        except asyncio.TimeoutError:
+            if self.breaker is not None:
+                self.breaker.record_failure(f"prefetch timeout after {self.upstream_timeout}s")
+            raise
+        except UpstreamError as e:
+            if self.breaker is not None:
+                self.breaker.record_failure(f"prefetch upstream error: {e}")
+            raise
+        if self.breaker is not None:
+            self.breaker.record_success(time.perf_counter() - started)
+        return response
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "prefetched": self.prefetched,
+            "budget_skipped": self.budget_skipped,
+            "cached": len(self.cache),
+            "budget_per_minute": self.budget_per_minute,
+        }
@@ -0,0 +1,113 @@
+"""
+Per-client token-bucket quotas for /chat.
+
+Each client gets a bucket of QUOTA_BURST requests refilled at
+QUOTA_RATE_PER_MIN. Clients are keyed by IP (see `client_key` in main.py);
+nothing the client sends can move it to another bucket.
+
+Backends:
+  • InMemoryQuotaBackend — per-process, the default.
+  • RedisQuotaBackend    — shared across workers/instances (QUOTA_BACKEND=redis,
+                           REDIS_URL=...). Needs the optional `redis` package.
+"""
+
+import math
+import os
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Tuple
+
+
+class QuotaBackend(ABC):
+    """Pluggable token-bucket store shared by all /chat requests."""
+
+    def __init__(self, rate_per_sec: float, burst: int):
+        self.rate = rate_per_sec
+        self.burst = burst
+
+    @abstractmethod
+    async def take(self, key: str, cost: float = 1.0) -> float:
+        """Spend `cost` tokens for `key`: 0 when allowed, else seconds until enough refill."""
+
+
+class InMemoryQuotaBackend(QuotaBackend):
+    MAX_KEYS = 10000
+
+    def __init__(self, rate_per_sec: float, burst: int):
+        super().__init__(rate_per_sec, burst)
+        self.buckets: Dict[str, Tuple[float, float]] = {}  # key -> (tokens, last update)
+
+    async def take(self, key: str, cost: float = 1.0) -> float:
+        now = time.monotonic()
+        tokens, ts = self.buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - ts) * self.rate)
+        if tokens >= cost:
+            self.buckets[key] = (tokens - cost, now)
+            wait = 0.0
+        else:
+            self.buckets[key] = (tokens, now)
+            wait = (cost - tokens) / self.rate
+        if len(self.buckets) > self.MAX_KEYS:
+            self._prune(now)
+        return wait
+
+    def _prune(self, now: float):
+        # A bucket idle long enough to refill completely is the same as no bucket.
+        full_after = self.burst / self.rate
+        self.buckets = {k: v for k, v in self.buckets.items() if now - v[1] < full_after}
+
+
+class RedisQuotaBackend(QuotaBackend):
+    # Atomic refill-and-take; returns {allowed, tokens_left}.
+    _SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local b = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(b[1]) or burst
+local ts = tonumber(b[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= cost then
+  tokens = tokens - cost
+  allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+    def __init__(self, rate_per_sec: float, burst: int, url: str, prefix: str = "quota:"):
+        super().__init__(rate_per_sec, burst)
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("QUOTA_BACKEND=redis requires the `redis` package") from e
+        self.client = redis.from_url(url)
+        self.script = self.client.register_script(self._SCRIPT)
+        self.prefix = prefix
+
+    async def take(self, key: str, cost: float = 1.0) -> float:
+        allowed, tokens = await self.script(
+            keys=[self.prefix + key], args=[self.rate, self.burst, time.time(), cost]
+        )
+        if int(allowed):
+            return 0.0
+        return (cost - float(tokens)) / self.rate
+
+
+def quota_from_env() -> Optional[QuotaBackend]:
+    rate_per_min = float(os.getenv("QUOTA_RATE_PER_MIN", "20"))
+    if rate_per_min <= 0:
+        return None
+    rate = rate_per_min / 60.0
+    burst = int(os.getenv("QUOTA_BURST", "10"))
+    backend = os.getenv("QUOTA_BACKEND", "memory").lower()
+    if backend == "redis":
+        return RedisQuotaBackend(rate, burst, url=os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+    return InMemoryQuotaBackend(rate, burst)
+
+
+def retry_after_header(wait: float) -> Dict[str, str]:
+    return {"Retry-After": str(max(1, math.ceil(wait)))}
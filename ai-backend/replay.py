@@ -0,0 +1,221 @@
+"""
+Offline replay of recorded /chat traces (see tracing.py).
+
+Re-runs prompt assembly and response parsing from `gemini_agent.py` against
+recorded traces, with a fake model that returns each trace's recorded raw
+output. Nothing is sent to Gemini. For every trace it reports the estimated
+prompt tokens, whether `_extract_json` + json.loads accepted the output, and
+the CPU time spent assembling the prompt and parsing the reply.
+
+    # Report for the working tree, or for any git revision
+    python replay.py run traces.jsonl.gz --out head.json
+    python replay.py run traces.jsonl.gz --rev HEAD~3 --out base.json
+
+    # Deltas between two reports
+    python replay.py compare base.json head.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import importlib
+import inspect
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def estimate_tokens(text: str) -> int:
+    # Same ~4 chars/token rule as page_format.estimate_tokens. Not imported from
+    # there so the revision under test loads its own page_format (if any).
+    return (len(text) + 3) // 4
+
+
+class _FakeModel:
+    """Stands in for genai.GenerativeModel and returns the recorded output."""
+
+    def __init__(self):
+        self.raw = ""
+        self.prompt = None
+        self.entered = 0.0
+        self.left = 0.0
+
+    async def generate_content_async(self, prompt):
+        self.entered = time.process_time()
+        self.prompt = prompt
+        parts = [SimpleNamespace(text=self.raw)] if self.raw else []
+        response = SimpleNamespace(prompt_feedback=None, parts=parts)
+        self.left = time.process_time()
+        return response
+
+
+def _p95(values):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(0.95 * (len(values) - 1))))]
+
+
+def _git(args, cwd):
+    return subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True, check=True).stdout.strip()
+
+
+async def _replay(code_dir: str, traces: list) -> list:
+    sys.path.insert(0, code_dir)
+    gemini_agent = importlib.import_module("gemini_agent")
+    models = importlib.import_module("models")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        agent = gemini_agent.GeminiAgent(api_key="offline-replay", model_name="replay")
+    fake = _FakeModel()
+    agent.model = fake
+    accepted = inspect.signature(agent.process_message).parameters
+
+    results = []
+    for trace in traces:
+        inp = trace["input"]
+        kwargs = {
+            "message": inp["message"],
+            "page_content": inp["page_content"],
+            "history": [models.HistoryItem(**h) for h in inp.get("history", [])],
+        }
+        if "page_format" in accepted:
+            kwargs["page_format"] = inp.get("page_format", "html")
+
+        fake.raw = trace.get("raw_output", "")
+        fake.prompt = None
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.process_time()
+            await agent.process_message(**kwargs)
+            end = time.process_time()
+
+        raw = fake.raw
+        parsed = False
+        json_str = agent._extract_json(raw) if raw else None
+        if json_str:
+            try:
+                parsed = isinstance(json.loads(json_str), dict)
+            except json.JSONDecodeError:
+                parsed = False
+
+        prompt = fake.prompt or ""
+        results.append({
+            "id": trace.get("id"),
+            "prompt_tokens": estimate_tokens(prompt),
+            "recorded_prompt_tokens": estimate_tokens(trace["prompt"]) if "prompt" in trace else None,
+            "parsed": parsed,
+            "assemble_cpu_ms": round((fake.entered - start) * 1000, 3) if fake.prompt is not None else None,
+            "parse_cpu_ms": round((end - fake.left) * 1000, 3) if fake.prompt is not None else None,
+        })
+    return results
+
+
+def _summarize(results: list) -> dict:
+    tokens = [r["prompt_tokens"] for r in results]
+    assemble = [r["assemble_cpu_ms"] for r in results if r["assemble_cpu_ms"] is not None]
+    parse = [r["parse_cpu_ms"] for r in results if r["parse_cpu_ms"] is not None]
+    return {
+        "traces": len(results),
+        "prompt_tokens_total": sum(tokens),
+        "prompt_tokens_mean": round(statistics.mean(tokens), 1) if tokens else 0.0,
+        "parse_success_rate": round(sum(r["parsed"] for r in results) / len(results), 4) if results else 0.0,
+        "assemble_cpu_ms_mean": round(statistics.mean(assemble), 3) if assemble else 0.0,
+        "assemble_cpu_ms_p95": _p95(assemble),
+        "parse_cpu_ms_mean": round(statistics.mean(parse), 3) if parse else 0.0,
+        "parse_cpu_ms_p95": _p95(parse),
+    }
+
+
+def run(traces_path: str, code_dir: str, out: str = None) -> dict:
+    from tracing import read_traces
+
+    traces = list(read_traces(traces_path))
+    results = asyncio.run(_replay(code_dir, traces))
+    try:
+        revision = _git(["rev-parse", "--short", "HEAD"], code_dir)
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    report = {"revision": revision, "code_dir": code_dir, "summary": _summarize(results), "traces": results}
+    if out:
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps({"revision": revision, **report["summary"]}, indent=2))
+    return report
+
+
+def run_at_revision(traces_path: str, rev: str, out: str):
+    """Check `rev` out into a temporary worktree and replay against its code."""
+    root = _git(["rev-parse", "--show-toplevel"], HERE)
+    backend = os.path.relpath(HERE, root)
+    tmp = tempfile.mkdtemp(prefix="replay-")
+    _git(["worktree", "add", "--detach", tmp, rev], root)
+    try:
+        subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "run", os.path.abspath(traces_path),
+             "--code-dir", os.path.join(tmp, backend), "--out", os.path.abspath(out)],
+            check=True,
+        )
+    finally:
+        _git(["worktree", "remove", "--force", tmp], root)
+
+
+def compare(base_path: str, head_path: str):
+    with open(base_path, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(head_path, encoding="utf-8") as f:
+        head = json.load(f)
+
+    print(f"{'metric':<24}{'base':>14}{'head':>14}{'delta':>14}")
+    for key, b in base["summary"].items():
+        h = head["summary"].get(key, 0)
+        print(f"{key:<24}{b:>14}{h:>14}{round(h - b, 4):>14}")
+
+    base_by_id = {r["id"]: r for r in base["traces"]}
+    deltas = [
+        r["prompt_tokens"] - base_by_id[r["id"]]["prompt_tokens"]
+        for r in head["traces"] if r["id"] in base_by_id
+    ]
+    if deltas:
+        print(f"\nPer-trace prompt-token delta over {len(deltas)} traces: "
+              f"mean {statistics.mean(deltas):+.1f}, min {min(deltas):+d}, max {max(deltas):+d}")
+    flipped = [
+        r["id"] for r in head["traces"]
+        if r["id"] in base_by_id and r["parsed"] != base_by_id[r["id"]]["parsed"]
+    ]
+    if flipped:
+        print(f"Parse result changed for {len(flipped)} traces: {', '.join(map(str, flipped[:10]))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded /chat traces offline.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="replay traces and write a report")
+    p_run.add_argument("traces")
+    p_run.add_argument("--rev", help="git revision to replay against (default: working tree)")
+    p_run.add_argument("--code-dir", default=HERE, help=argparse.SUPPRESS)
+    p_run.add_argument("--out")
+
+    p_cmp = sub.add_parser("compare", help="compare two reports")
+    p_cmp.add_argument("base")
+    p_cmp.add_argument("head")
+
+    args = parser.parse_args()
+    if args.command == "compare":
+        compare(args.base, args.head)
+    elif args.rev:
+        run_at_revision(args.traces, args.rev, args.out or f"replay-{args.rev.replace('/', '_')}.json")
+    else:
+        run(args.traces, args.code_dir, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Weighted fair queuing in front of the upstream Gemini call.
+
+At most UPSTREAM_CONCURRENCY model calls run at once. When all slots are
+busy, waiters are ordered by start-time fair queuing: every client (flow)
+gets a virtual finish time of max(now, its previous finish) + 1/weight, and
+the smallest finish time goes next. A client firing many requests pushes
+its own finish times out, so other visitors keep getting slots.
+
+Traffic is split into lanes. "interactive" (the widget) has a high weight;
+"batch" (replays, scripts, prefetch) has a low weight and is capped at
+BATCH_MAX_CONCURRENCY slots so it can never occupy the whole pool.
+"""
+
+import asyncio
+import itertools
+import os
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+LANES = ("interactive", "batch")
+
+
+class QueueTimeout(Exception):
+    pass
+
+
+class _Waiter:
+    __slots__ = ("finish", "seq", "start", "lane", "future")
+
+    def __init__(self, finish: float, seq: int, start: float, lane: str, future: asyncio.Future):
+        self.finish = finish
+        self.seq = seq
+        self.start = start
+        self.lane = lane
+        self.future = future
+
+
+class FairScheduler:
+    def __init__(
+        self,
+        concurrency: int = 4,
+        lane_weights: Optional[Dict[str, float]] = None,
+        lane_limits: Optional[Dict[str, int]] = None,
+        queue_timeout: float = 30.0,
+    ):
+        self.concurrency = concurrency
+        self.lane_weights = lane_weights or {"interactive": 8.0, "batch": 1.0}
+        self.lane_limits = lane_limits or {"batch": max(1, concurrency // 4)}
+        self.queue_timeout = queue_timeout
+
+        self.active = 0
+        self.lane_active: Counter = Counter()
+        self.queue: List[_Waiter] = []
+        self.virtual_time = 0.0
+        self.flow_finish: Dict[str, float] = {}
+        self._seq = itertools.count()
+        self.timeouts = 0
+
+    @classmethod
+    def from_env(cls) -> "FairScheduler":
+        concurrency = int(os.getenv("UPSTREAM_CONCURRENCY", "4"))
+        return cls(
+            concurrency=concurrency,
+            lane_limits={"batch": int(os.getenv("BATCH_MAX_CONCURRENCY", str(max(1, concurrency // 4))))},
+            queue_timeout=float(os.getenv("QUEUE_TIMEOUT_SECONDS", "30")),
+        )
+
+    @asynccontextmanager
+    async def slot(self, flow: str, lane: str = "interactive"):
+        """Hold one upstream slot for the duration of the block."""
+        lane = lane if lane in self.lane_weights else "interactive"
+        await self._acquire(flow, lane)
+        try:
+            yield
+        finally:
+            self._release(lane)
+
+    def _can_run(self, lane: str) -> bool:
+        limit = self.lane_limits.get(lane)
+        return self.active < self.concurrency and (limit is None or self.lane_active[lane] < limit)
+
+    def _grant(self, lane: str):
+        self.active += 1
+        self.lane_active[lane] += 1
+
+    async def _acquire(self, flow: str, lane: str):
+        if not self.queue and self._can_run(lane):
+            self._grant(lane)
+            return
+
+        start = max(self.virtual_time, self.flow_finish.get(flow, 0.0))
+        finish = start + 1.0 / self.lane_weights[lane]
+        self.flow_finish[flow] = finish
+        waiter = _Waiter(finish, next(self._seq), start, lane, asyncio.get_running_loop().create_future())
+        self.queue.append(waiter)
+        # A free slot may exist if only lane-capped waiters were queued ahead.
+        self._dispatch()
+        try:
+            await asyncio.wait_for(waiter.future, self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted at the same moment we gave up — hand the slot back.
+                self._release(lane)
+            elif waiter in self.queue:
+                self.queue.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self.timeouts += 1
+                raise QueueTimeout(f"waited more than {self.queue_timeout}s for an upstream slot")
+            raise
+
+    def _release(self, lane: str):
+        self.active -= 1
+        self.lane_active[lane] -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        while self.queue:
+            self.queue = [w for w in self.queue if not w.future.done()]
+            eligible = [w for w in self.queue if self._can_run(w.lane)]
+            if not eligible:
+                break
+            nxt = min(eligible, key=lambda w: (w.finish, w.seq))
+            self.queue.remove(nxt)
+            self.virtual_time = max(self.virtual_time, nxt.start)
+            self._grant(nxt.lane)
+            nxt.future.set_result(None)
+
+        if not self.queue:
+            # Idle flows have no pending finish time worth remembering.
+            self.flow_finish.clear()
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "active": self.active,
+            "queued": len(self.queue),
+            "lane_active": {lane: self.lane_active[lane] for lane in LANES},
+            "queue_timeouts": self.timeouts,
+        }
@@ -0,0 +1,111 @@
+"""
+Optional /chat trace recorder.
+
+When TRACE_PATH is set, a sample of /chat requests (TRACE_SAMPLE_RATE) is
+appended to a gzip-compressed JSONL file: the request inputs, the assembled
+prompt, the raw and parsed model output and stage timings. Emails and phone numbers
+are scrubbed and no client address is stored. `replay.py` reads these files.
+"""
+
+import gzip
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from typing import Optional
+
+TRACE_VERSION = 1
+
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+_PHONE = re.compile(r"\+?\d[\d\s().-]{7,}\d")
+
+
+def anonymize(text: str) -> str:
+    text = _EMAIL.sub("user@example.com", text)
+    return _PHONE.sub("000-000-0000", text)
+
+
+def _anonymize_all(value):
+    """anonymize() every string inside nested dicts and lists."""
+    if isinstance(value, str):
+        return anonymize(value)
+    if isinstance(value, dict):
+        return {k: _anonymize_all(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_anonymize_all(v) for v in value]
+    return value
+
+
+class TraceRecorder:
+    def __init__(self, path: str, sample_rate: float = 1.0):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.recorded = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> Optional["TraceRecorder"]:
+        path = os.getenv("TRACE_PATH")
+        if not path:
+            return None
+        return cls(path, sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "1.0")))
+
+    def start(self, request) -> Optional[dict]:
+        """Begin a trace for a ChatRequest, or None if this request isn't sampled."""
+        if random.random() >= self.sample_rate:
+            return None
+        return {
+            "v": TRACE_VERSION,
+            "id": uuid.uuid4().hex[:16],
+            "ts": round(time.time(), 3),
+            "input": {
+                "message": request.message,
+                "page_content": request.page_content,
+                "page_format": request.page_format,
+                "route": request.route,
+                "history": [{"role": h.role, "parts": list(h.parts)} for h in request.history],
+            },
+        }
+
+    def write(self, trace: dict):
+        """Anonymize and append one finished trace. Runs as a background task."""
+        record = dict(trace)
+        inp = dict(record["input"])
+        inp["message"] = anonymize(inp["message"])
+        inp["page_content"] = anonymize(inp["page_content"])
+        inp["history"] = [
+            {"role": h["role"], "parts": [anonymize(p) for p in h["parts"]]} for h in inp["history"]
+        ]
+        record["input"] = inp
+        if "prompt" in record:
+            record["prompt"] = anonymize(record["prompt"])
+        if "raw_output" in record:
+            record["raw_output"] = anonymize(record["raw_output"])
+        if "output" in record:
+            # Parsed response: ToolCall.value holds whatever the model typed into a form.
+            record["output"] = _anonymize_all(record["output"])
+
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        try:
+            # Each append is its own gzip member; gzip.open reads them back as one stream.
+            with self._lock, gzip.open(self.path, "at", encoding="utf-8") as f:
+                f.write(line)
+            self.recorded += 1
+        except OSError as e:
+            print(f"⚠️ Failed to write trace: {e}")
+
+
+def read_traces(path: str):
+    """Yield trace records from a (possibly gzip-compressed) JSONL file."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
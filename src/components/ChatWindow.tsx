@@ -57,6 +57,7 @@ export const ChatWindow: React.FC<ChatWindowProps> = ({ onClose }) => {
             const response = await sendChatMessage({
                 message: userMsg,
                 page_content: pageContent,
+                route: window.location.pathname,
                 history: history
             });
 
@@ -3,6 +3,10 @@
 export interface ChatRequestPayload {
     message: string;
     page_content: string;
+    // Omitted = 'html'; the backend converts HTML snapshots to 'outline-v1' itself.
+    page_format?: 'html' | 'outline-v1';
+    // Current pathname; lets the backend prefetch likely follow-up answers.
+    route?: string;
     history: HistoryItem[];
 }
 
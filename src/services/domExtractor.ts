@@ -13,6 +13,13 @@ export function getVisiblePageContent(): string {
         );
     };
 
+    // Page text and attribute values are escaped so a literal `<` or `"` can't
+    // be read back as markup by the backend's parser (ai-backend/page_format.py)
+    const escapeText = (text: string) =>
+        text.replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;');
+    const escapeAttr = (value: string) => escapeText(value).replace(/"/g, '&quot;');
+    const attr = (key: string, value: string | null) => (value ? ` ${key}="${escapeAttr(value)}"` : '');
+
     // Helper to extract structure and text
     const extractStructure = (el: HTMLElement, depth: number = 0): string => {
         if (depth > 25) return ''; // Increased depth limit
@@ -22,12 +29,12 @@ export function getVisiblePageContent(): string {
         const tagName = el.tagName.toLowerCase();
 
         // Key attributes to identify elements
-        const id = el.id ? ` id="${el.id}"` : '';
-        const name = el.getAttribute('name') ? ` name="${el.getAttribute('name')}"` : '';
-        const placeholder = el.getAttribute('placeholder') ? ` placeholder="${el.getAttribute('placeholder')}"` : '';
-        const ariaLabel = el.getAttribute('aria-label') ? ` aria-label="${el.getAttribute('aria-label')}"` : '';
-        const type = el.getAttribute('type') ? ` type="${el.getAttribute('type')}"` : '';
-        const href = el.getAttribute('href') ? ` href="${el.getAttribute('href')}"` : '';
+        const id = attr('id', el.id);
+        const name = attr('name', el.getAttribute('name'));
+        const placeholder = attr('placeholder', el.getAttribute('placeholder'));
+        const ariaLabel = attr('aria-label', el.getAttribute('aria-label'));
+        const type = attr('type', el.getAttribute('type'));
+        const href = attr('href', el.getAttribute('href'));
 
         // Priority elements that should always be included
         const isPriority = ['section', 'main', 'header', 'footer', 'nav', 'article', 'form'].includes(tagName);
@@ -55,7 +62,7 @@ export function getVisiblePageContent(): string {
             // Get the full text content, stripping extra whitespace
             const fullText = el.textContent.trim().replace(/\s+/g, ' ');
             const maxLength = 100;
-            textContent = fullText.slice(0, maxLength);
+            textContent = escapeText(fullText.slice(0, maxLength));
 
             // Still process children for nested structure, but we've captured the text
             if (el.children.length > 0) {
@@ -70,7 +77,7 @@ export function getVisiblePageContent(): string {
         } else if (el.children.length === 0 && el.textContent?.trim()) {
             // For leaf nodes (no children), capture text
             const maxLength = (isHeading) ? 100 : 60;
-            textContent = el.textContent.trim().slice(0, maxLength);
+            textContent = escapeText(el.textContent.trim().slice(0, maxLength));
         } else {
             // For structural elements, recursively process children
             for (const child of Array.from(el.children)) {